@@ -33,6 +33,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ErsteGroupConfigEntry) -
     # Use runtime_data instead of hass.data
     entry.runtime_data = coordinator
 
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
@@ -41,3 +43,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ErsteGroupConfigEntry) -
 async def async_unload_entry(hass: HomeAssistant, entry: ErsteGroupConfigEntry) -> bool:
     """Unload a config entry."""
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+async def _async_update_listener(
+    hass: HomeAssistant, entry: ErsteGroupConfigEntry
+) -> None:
+    """Reload the entry when options change."""
+    # The coordinator also updates the entry, e.g. to clear one-shot options
+    if entry.options != entry.runtime_data.applied_options:
+        await hass.config_entries.async_reload(entry.entry_id)
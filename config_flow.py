@@ -2,34 +2,64 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import voluptuous as vol
 from typing import Any
 from urllib.parse import urlencode, parse_qs, urlparse
 
+from aiohttp import ClientError, ClientSession
+
 from homeassistant import config_entries
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from .const import (
     DOMAIN,
+    API_ACCOUNTS,
+    API_BALANCES,
     CONF_API_KEY,
     CONF_CLIENT_ID,
     CONF_CLIENT_SECRET,
+    CONF_HISTORY_DB,
     CONF_REFRESH_TOKEN,
     CONF_API_BASE_URL,
     CONF_IDP_BASE_URL,
     DEFAULT_API_BASE_URL,
     DEFAULT_IDP_BASE_URL,
     CONF_PAYDAY,
+    CONF_PROFILE_REFRESHES,
+    CONF_RECORD_FILE,
+    CONF_RECORD_REFRESHES,
+    CONF_REPLAY_FILE,
     DEFAULT_PAYDAY,
+    DEFAULT_RECORD_REFRESHES,
     OAUTH_SCOPES,
+    PROBE_CONCURRENCY,
+    PROBE_TIMEOUT,
+)
+from .dataclass import (
+    Account,
+    ApiSnapshot,
+    Balance,
+    account_from_api,
+    balance_from_api,
 )
+from .snapshot import async_add_snapshot
 
 _LOGGER = logging.getLogger(__name__)
 
 from homeassistant.helpers.selector import TextSelector
 
 
+class ApiProbeFailed(Exception):
+    """A step of the API probe failed, `reason` is the abort reason."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
 @config_entries.HANDLERS.register(DOMAIN)
 class ErsteGroupConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for ErsteGroup."""
@@ -45,6 +75,14 @@ class ErsteGroupConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._idp_base_url: str | None = None
         self._payday: int = DEFAULT_PAYDAY
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> ErsteGroupOptionsFlow:
+        """Get the options flow for this handler."""
+        return ErsteGroupOptionsFlow()
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -151,35 +189,103 @@ class ErsteGroupConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 "client_secret": self._client_secret,
             }
 
-            async with session.post(url, data=data) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    _LOGGER.error("Token exchange failed: %s", error_text)
-                    return self.async_abort(reason="token_exchange_failed")
+            async with asyncio.timeout(PROBE_TIMEOUT):
+                async with session.post(url, data=data) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        _LOGGER.error("Token exchange failed: %s", error_text)
+                        return self.async_abort(reason="token_exchange_failed")
+
+                    token_data = await response.json()
+                    refresh_token = token_data.get("refresh_token")
+
+                    if not refresh_token:
+                        return self.async_abort(reason="no_refresh_token")
+
+                    access_token = token_data.get("access_token")
+
+                    if not access_token:
+                        return self.async_abort(reason="no_access_token")
+
+                # Check the API key and base URL before creating the entry
+                snapshot = await self._probe_api(session, access_token)
+
+            async_add_snapshot(self.hass, refresh_token, snapshot)
+
+            # Create config entry
+            return self.async_create_entry(
+                title="ErsteGroup Bank",
+                data={
+                    CONF_API_KEY: self._api_key,
+                    CONF_CLIENT_ID: self._client_id,
+                    CONF_CLIENT_SECRET: self._client_secret,
+                    CONF_REFRESH_TOKEN: refresh_token,
+                    CONF_API_BASE_URL: self._api_base_url,
+                    CONF_IDP_BASE_URL: self._idp_base_url,
+                    CONF_PAYDAY: self._payday,
+                },
+            )
 
-                token_data = await response.json()
-                refresh_token = token_data.get("refresh_token")
+        except ApiProbeFailed as err:
+            _LOGGER.error("API probe failed: %s", err.reason)
+            return self.async_abort(reason=err.reason)
+        except TimeoutError:
+            _LOGGER.error("Token exchange and API probe timed out")
+            return self.async_abort(reason="probe_timeout")
+        except Exception as err:
+            _LOGGER.error("Error during token exchange: %s", err)
+            return self.async_abort(reason="unknown_error")
 
-                if not refresh_token:
-                    return self.async_abort(reason="no_refresh_token")
+    async def _probe_api(
+        self, session: ClientSession, access_token: str
+    ) -> ApiSnapshot:
+        """List accounts and fetch their balances a few at a time."""
+        base_url = self._api_base_url.rstrip("/")
+        headers = {
+            "WEB-API-key": self._api_key,
+            "Authorization": f"Bearer {access_token}",
+        }
 
-                # Create config entry
-                return self.async_create_entry(
-                    title="ErsteGroup Bank",
-                    data={
-                        CONF_API_KEY: self._api_key,
-                        CONF_CLIENT_ID: self._client_id,
-                        CONF_CLIENT_SECRET: self._client_secret,
-                        CONF_REFRESH_TOKEN: refresh_token,
-                        CONF_API_BASE_URL: self._api_base_url,
-                        CONF_IDP_BASE_URL: self._idp_base_url,
-                        CONF_PAYDAY: self._payday,
-                    },
+        async def get(url: str) -> dict[str, Any]:
+            async with session.get(url, headers=headers) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        try:
+            data = await get(f"{base_url}{API_ACCOUNTS}")
+            accounts = [
+                account_from_api(account) for account in data.get("accounts", [])
+            ]
+        except (ClientError, KeyError) as err:
+            _LOGGER.error("Listing accounts failed: %s", err)
+            raise ApiProbeFailed("probe_accounts_failed") from err
+
+        # Many parallel requests on a large login would risk rate limiting
+        semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+        async def get_balance(account: Account) -> Balance:
+            async with semaphore:
+                response = await get(
+                    f"{base_url}{API_BALANCES.format(account_id=account.id)}"
                 )
+            return balance_from_api(response["balances"][0])
 
-        except Exception as err:
-            _LOGGER.error("Error during token exchange: %s", err)
-            return self.async_abort(reason="unknown_error")
+        try:
+            # The first failure cancels the remaining requests
+            async with asyncio.TaskGroup() as group:
+                tasks = {
+                    account.id: group.create_task(get_balance(account))
+                    for account in accounts
+                }
+        except* (ClientError, KeyError, IndexError, ValueError) as err:
+            _LOGGER.error("Fetching balances failed: %s", err.exceptions[0])
+            raise ApiProbeFailed("probe_balances_failed") from err.exceptions[0]
+
+        return ApiSnapshot(
+            access_token=access_token,
+            accounts=accounts,
+            balances={account_id: task.result() for account_id, task in tasks.items()},
+        )
 
     async def async_step_reauth(self, entry_data: dict[str, Any]) -> FlowResult:
         """Handle reauth flow."""
@@ -277,3 +383,55 @@ class ErsteGroupConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         except Exception as err:
             _LOGGER.error("Error during reauth: %s", err)
             return self.async_abort(reason="unknown_error")
+
+
+class ErsteGroupOptionsFlow(config_entries.OptionsFlow):
+    """Handle ErsteGroup options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage history and debugging options."""
+        errors = {}
+
+        if user_input is not None:
+            if user_input.get(CONF_RECORD_FILE) and user_input.get(CONF_REPLAY_FILE):
+                errors["base"] = "record_and_replay"
+            else:
+                return self.async_create_entry(data=user_input)
+
+        options = self.config_entry.options
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_HISTORY_DB, default=options.get(CONF_HISTORY_DB, False)
+                    ): bool,
+                    vol.Optional(
+                        CONF_RECORD_FILE,
+                        description={
+                            "suggested_value": options.get(CONF_RECORD_FILE)
+                        },
+                    ): str,
+                    vol.Optional(
+                        CONF_RECORD_REFRESHES,
+                        default=options.get(
+                            CONF_RECORD_REFRESHES, DEFAULT_RECORD_REFRESHES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=288)),
+                    vol.Optional(
+                        CONF_REPLAY_FILE,
+                        description={
+                            "suggested_value": options.get(CONF_REPLAY_FILE)
+                        },
+                    ): str,
+                    vol.Optional(
+                        CONF_PROFILE_REFRESHES,
+                        default=options.get(CONF_PROFILE_REFRESHES, 0),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+                }
+            ),
+            errors=errors,
+        )
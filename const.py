@@ -19,6 +19,7 @@ DEFAULT_IDP_BASE_URL = (
     "https://webapi.developers.erstegroup.com/api/csas/sandbox/v1/sandbox-idp"
 )
 DEFAULT_PAYDAY = 1
+DEFAULT_RECORD_REFRESHES = 12
 
 # OAuth2 scopes
 OAUTH_SCOPES = ["siblings.accounts"]
@@ -27,6 +28,22 @@ OAUTH_SCOPES = ["siblings.accounts"]
 API_ACCOUNTS = "/my/accounts"
 API_BALANCES = "/my/accounts/{account_id}/balance"
 API_TRANSACTIONS = "/my/accounts/{account_id}/transactions"
+TRANSACTIONS_PAGE_SIZE = 100
+
+# Timeout of the token exchange and API probe run by the config flow
+PROBE_TIMEOUT = 10  # seconds
+# Balance requests the probe may have in flight at once
+PROBE_CONCURRENCY = 4
+
+# How long the config flow snapshot may warm up the first refresh
+SNAPSHOT_MAX_AGE = 300  # seconds
 
 # Update interval
 UPDATE_INTERVAL = 300  # 5 minutes
+
+# Options
+CONF_RECORD_FILE = "record_file"
+CONF_RECORD_REFRESHES = "record_refreshes"
+CONF_REPLAY_FILE = "replay_file"
+CONF_HISTORY_DB = "history_db"
+CONF_PROFILE_REFRESHES = "profile_refreshes"
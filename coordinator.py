@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import date, datetime, timedelta
 import logging
-from typing import Any
+import sqlite3
+from typing import Any, TypeVar
 
 from aiohttp import ClientError
 
@@ -22,22 +25,36 @@ from .const import (
     CONF_API_KEY,
     CONF_CLIENT_ID,
     CONF_CLIENT_SECRET,
+    CONF_HISTORY_DB,
     CONF_IDP_BASE_URL,
+    CONF_PROFILE_REFRESHES,
+    CONF_RECORD_FILE,
+    CONF_RECORD_REFRESHES,
     CONF_REFRESH_TOKEN,
+    CONF_REPLAY_FILE,
+    DEFAULT_RECORD_REFRESHES,
+    DOMAIN,
+    TRANSACTIONS_PAGE_SIZE,
     UPDATE_INTERVAL,
 )
 from .dataclass import (
     Account,
     Balance,
     DebitCreditEnum,
-    MonetaryAmount,
     Transaction,
     account_from_api,
+    balance_from_api,
     transaction_from_api,
 )
+from .profiling import RefreshProfiler
+from .replay import RecordingSession, ReplaySession
+from .snapshot import async_pop_snapshot
+from .storage import TransactionStore
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 
 class ErsteGroupCoordinator(DataUpdateCoordinator):
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
@@ -51,7 +68,18 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
         self.refresh_token = entry.data[CONF_REFRESH_TOKEN]
         self.access_token = None
         self.session = async_get_clientsession(hass)
+        # Options this coordinator was set up with
+        self.applied_options = dict(entry.options)
+        self._recorder: RecordingSession | None = None
+        self._replay: ReplaySession | None = None
+        self._store: TransactionStore | None = None
+        self._profiler: RefreshProfiler | None = None
+        # In-flight token refresh and updates, shared by overlapping callers
+        self._in_flight: dict[str, asyncio.Task] = {}
         self.accounts: list[Account] | None = None
+        self.own_ibans: set[str] = set()
+        # Left behind by the config flow, saves the first refresh a few requests
+        self._snapshot = async_pop_snapshot(hass, self.refresh_token)
 
         super().__init__(
             hass,
@@ -61,8 +89,116 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
             config_entry=entry,
         )
 
+    @property
+    def replaying(self) -> bool:
+        """Whether responses come from a recording instead of the bank."""
+        return self._replay is not None
+
+    async def _async_setup(self) -> None:
+        """Set up recording/replay, history database and profiling, if enabled."""
+        options = self.applied_options
+
+        if replay_file := options.get(CONF_REPLAY_FILE):
+            try:
+                self._replay = await ReplaySession.async_load(
+                    self.hass, self.hass.config.path(replay_file)
+                )
+            except (OSError, ValueError) as err:
+                raise UpdateFailed(f"Failed to load recording: {err}") from err
+            self.session = self._replay
+            _LOGGER.warning("Replaying recorded API responses from %s", replay_file)
+
+        elif record_file := options.get(CONF_RECORD_FILE):
+            refreshes = options.get(CONF_RECORD_REFRESHES, DEFAULT_RECORD_REFRESHES)
+            self._recorder = RecordingSession(
+                self.session,
+                self.hass.config.path(record_file),
+                self.client_secret,
+                refreshes,
+            )
+            self.session = self._recorder
+            _LOGGER.warning(
+                "Recording the next %d refreshes to %s", refreshes, record_file
+            )
+
+        if options.get(CONF_HISTORY_DB):
+            # Replayed transactions must not end up in the real history
+            path = (
+                ":memory:"
+                if self._replay is not None
+                else self.hass.config.path(f"{DOMAIN}_{self.entry.entry_id}.db")
+            )
+            store = TransactionStore(path)
+            try:
+                await self.hass.async_add_executor_job(store.open)
+            except sqlite3.Error as err:
+                raise UpdateFailed(f"Failed to open history database: {err}") from err
+            self._store = store
+
+        if cycles := options.get(CONF_PROFILE_REFRESHES):
+            self._profiler = RefreshProfiler(
+                cycles,
+                self.hass.config.path(f"{DOMAIN}_profile_{self.entry.entry_id}.txt"),
+            )
+            _LOGGER.warning("Profiling the next %d refreshes", cycles)
+
+    async def async_shutdown(self) -> None:
+        """Stop in-flight work, profiling and the history database on unload."""
+        await super().async_shutdown()
+
+        in_flight = list(self._in_flight.values())
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+        if self._profiler is not None:
+            self._profiler.abort()
+            self._profiler = None
+
+        if self._store is not None:
+            await self.hass.async_add_executor_job(self._store.close)
+            self._store = None
+
+    async def _single_flight(
+        self, key: str, factory: Callable[[], Awaitable[_T]]
+    ) -> _T:
+        """Run `factory` once per key, overlapping callers await the same result."""
+        task = self._in_flight.get(key)
+
+        if task is None:
+
+            async def _run() -> _T:
+                try:
+                    return await factory()
+                finally:
+                    # Cleared before any caller resumes, so later calls start afresh
+                    self._in_flight.pop(key, None)
+
+            task = self.config_entry.async_create_background_task(
+                self.hass, _run(), f"{self.name} {key}"
+            )
+            if not task.done():
+                self._in_flight[key] = task
+
+            def _done(finished: asyncio.Task) -> None:
+                # Callers that were cancelled meanwhile never see the result
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(_done)
+        else:
+            _LOGGER.debug("Joining in-flight %s", key)
+
+        # A cancelled caller must not cancel the work others are waiting for
+        return await asyncio.shield(task)
+
     async def _get_access_token(self) -> str:
         """Get valid access token, refreshing if needed."""
+        # Concurrent grants would invalidate each other with a rotating IdP
+        return await self._single_flight("token refresh", self._refresh_access_token)
+
+    async def _refresh_access_token(self) -> str:
+        """Exchange the refresh token for a new access token."""
         url = f"{self.idp_base_url}/token"
         data = {
             "grant_type": "refresh_token",
@@ -74,6 +210,9 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
         try:
             async with self.session.post(url, data=data) as response:
                 if response.status in (401, 403):
+                    if self.replaying:
+                        # A recorded rejection says nothing about the stored token
+                        raise UpdateFailed("Recorded token refresh was rejected")
                     raise ConfigEntryAuthFailed("Refresh token expired or invalid")
 
                 response.raise_for_status()
@@ -90,51 +229,153 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
             self.refresh_token = token_data["refresh_token"]
             _LOGGER.debug("New refresh token received")
 
+            # A rotating IdP has invalidated the stored token, restarts need this one
+            if self._replay is None:
+                self.hass.config_entries.async_update_entry(
+                    self.entry,
+                    data={**self.entry.data, CONF_REFRESH_TOKEN: self.refresh_token},
+                )
+
         return self.access_token
 
     async def _async_update_data(self) -> dict[str, Any]:
         """Entry point from hass"""
-        self.access_token = await self._get_access_token()
+        return await self._single_flight("update", self._update_and_record)
+
+    async def _update_and_record(self) -> dict[str, Any]:
+        """Fetch data, flushing recorded API traffic and profiles afterwards"""
+        profiler = self._profiler
+
+        try:
+            if profiler is not None:
+                try:
+                    profiler.start()
+                except ValueError as err:
+                    # E.g. the profiler integration is running
+                    _LOGGER.warning("Profiling disabled: %s", err)
+                    profiler = self._profiler = None
+                    self._clear_options(CONF_PROFILE_REFRESHES)
+
+            return await self._fetch_data()
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                await self.hass.async_add_executor_job(profiler.collect_allocations)
+                if profiler.done:
+                    self._profiler = None
+                    self._clear_options(CONF_PROFILE_REFRESHES)
+                    await self._async_write_profile(profiler)
+
+            if self._recorder is not None:
+                await self._async_flush_recording(self._recorder)
+
+    async def _async_flush_recording(self, recorder: RecordingSession) -> None:
+        await recorder.async_flush(self.hass)
+        if not recorder.done:
+            return
+
+        self.session = recorder.session
+        self._recorder = None
+        self._clear_options(CONF_RECORD_FILE, CONF_RECORD_REFRESHES)
+        _LOGGER.warning("Recorded %d refreshes, recording stopped", recorder.flushes)
+
+    def _clear_options(self, *keys: str) -> None:
+        """Turn off one-shot options once done, without reloading the entry"""
+        self.applied_options = {
+            key: value
+            for key, value in self.applied_options.items()
+            if key not in keys
+        }
+        self.hass.config_entries.async_update_entry(
+            self.entry, options=self.applied_options
+        )
 
-        self.accounts = await self._fetch_accounts()
+    def _now(self) -> datetime:
+        """Current time, or the recording time while replaying"""
+        if self._replay is not None:
+            return self._replay.now
+        return datetime.now()
+
+    async def _async_write_profile(self, profiler: RefreshProfiler) -> None:
+        try:
+            await self.hass.async_add_executor_job(profiler.write_summary)
+        except OSError as err:
+            _LOGGER.error("Failed to write profile to %s: %s", profiler.path, err)
+            return
+        _LOGGER.warning("Refresh profile written to %s", profiler.path)
+
+    async def _fetch_data(self) -> dict[str, Any]:
+        """Fetch and aggregate data of all accounts"""
+        snapshot, self._snapshot = self._snapshot, None
+
+        if snapshot is not None:
+            _LOGGER.debug("Starting from config flow snapshot")
+            self.access_token = snapshot.access_token
+            self.accounts = snapshot.accounts
+        else:
+            self.access_token = await self._get_access_token()
+            self.accounts = await self._fetch_accounts()
+
+        self.own_ibans = {account.iban for account in self.accounts}
 
         # TODO Convert `data` this to a dataclass
         data = {"accounts": {}}
         for account in self.accounts:
-            # Fetch balance
+            data["accounts"][account.id] = await self._fetch_account_data(
+                account, snapshot.balances.get(account.id) if snapshot else None
+            )
+
+        return data
+
+    async def _fetch_account_data(
+        self, account: Account, balance: Balance | None = None
+    ) -> dict[str, Any]:
+        """Fetch balance and transaction aggregates of a single account"""
+        if balance is None:
             balance = await self._fetch_balance(account.id)
 
+        first_of_month = (
+            self._now()
+            .replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            .date()
+        )
+
+        if self._store is not None:
+            (
+                spending_30d,
+                income_30d,
+                spending_mtd,
+                income_mtd,
+            ) = await self._aggregate_from_store(account.id, first_of_month)
+        else:
             # Fetch transactions for last 30 days
             transactions_30d = await self._fetch_transactions(account.id, days=30)
-            spending_30d, income_30d = self._calculate_spending_income(transactions_30d)
+            spending_30d, income_30d = self._calculate_spending_income(
+                transactions_30d
+            )
 
             # Derive MTD by filtering
-            first_of_month = (
-                datetime.now()
-                .replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                .date()
-            )
             transactions_mtd = [
                 t for t in transactions_30d if t.valueDate >= first_of_month
             ]
-            spending_mtd, income_mtd = self._calculate_spending_income(transactions_mtd)
-
-            # TODO This could be moved elsewhere
-            data["accounts"][account.id] = {
-                "id": account.id,
-                "number": account.iban,
-                "name": account.name,
-                "friendly_name": account.name + " " + account.product,
-                "product": account.product,
-                "currency": balance.currency,
-                "balance": balance.amount,
-                "spending_mtd": spending_mtd,
-                "income_mtd": income_mtd,
-                "spending_30d": spending_30d,
-                "income_30d": income_30d,
-            }
+            spending_mtd, income_mtd = self._calculate_spending_income(
+                transactions_mtd
+            )
 
-        return data
+        # TODO This could be moved elsewhere
+        return {
+            "id": account.id,
+            "number": account.iban,
+            "name": account.name,
+            "friendly_name": account.name + " " + account.product,
+            "product": account.product,
+            "currency": balance.currency,
+            "balance": balance.amount,
+            "spending_mtd": spending_mtd,
+            "income_mtd": income_mtd,
+            "spending_30d": spending_30d,
+            "income_30d": income_30d,
+        }
 
     async def _fetch_accounts(self) -> list[Account]:
         """Fetch accounts list"""
@@ -161,18 +402,23 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
                 f"Expected more than zero balances on account {account_id}"
             )
 
-            balance_data = data["balances"][0]
-            amount = float(balance_data["amount"]["value"])
-            currency = balance_data["amount"]["currency"]
-
-            return MonetaryAmount(amount, currency)
+            return balance_from_api(data["balances"][0])
 
     async def _fetch_transactions(
         self, account_id: str, days: int | None = None
     ) -> list[Transaction]:
         """Fetch transactions for an account"""
+        transactions = []
+        async for page in self._fetch_transaction_pages(account_id, days):
+            transactions.extend(page)
+        return transactions
+
+    async def _fetch_transaction_pages(
+        self, account_id: str, days: int | None = None
+    ) -> AsyncIterator[list[Transaction]]:
+        """Fetch transactions for an account, one page at a time"""
         # See https://developers.erstegroup.com/docs/apis/bank.csas/bank.csas.v3%2Faccounts for API docs
-        today = datetime.now()
+        today = self._now()
 
         if days is None:
             # Current month
@@ -182,19 +428,49 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
             from_date = (today - timedelta(days=days)).strftime("%Y-%m-%d")
 
         url = f"{self.api_base_url}{API_TRANSACTIONS.format(account_id=account_id)}"
-        params = {"fromDate": from_date, "size": 100}
         headers = self._construct_auth_headers()
+        page: int | None = 0
 
-        async with self.session.get(url, headers=headers, params=params) as response:
-            # TODO This api is paged, implement paging when needed
-            response.raise_for_status()
-            data = await response.json()
+        while page is not None:
+            params = {
+                "fromDate": from_date,
+                "size": TRANSACTIONS_PAGE_SIZE,
+                "page": page,
+            }
+
+            async with self.session.get(
+                url, headers=headers, params=params
+            ) as response:
+                response.raise_for_status()
+                data = await response.json()
 
-            return [
+            yield [
                 transaction_from_api(transaction)
                 for transaction in data["transactions"]
             ]
 
+            page = data.get("nextPage")
+
+    async def _aggregate_from_store(
+        self, account_id: str, first_of_month: date
+    ) -> tuple[float, float, float, float]:
+        """Store fetched transactions and sum the 30 day and MTD windows in SQL"""
+        thirty_days_ago = self._now().date() - timedelta(days=30)
+        transactions = await self._fetch_transactions(account_id, days=30)
+
+        try:
+            # One executor job, a thread hop per query dominates with many accounts
+            return await self.hass.async_add_executor_job(
+                self._store.sync_window,
+                account_id,
+                transactions,
+                thirty_days_ago,
+                first_of_month,
+                self.own_ibans,
+            )
+        except sqlite3.Error as err:
+            raise UpdateFailed(f"Transaction history database error: {err}") from err
+
     def _construct_auth_headers(self) -> dict[str, str]:
         headers = {
             "WEB-API-key": self.api_key,
@@ -209,8 +485,8 @@ class ErsteGroupCoordinator(DataUpdateCoordinator):
         # TODO Move to different file
         spending = 0.0
         income = 0.0
-        # Requires self.accounts to be set before calling
-        own_ibans = [account.iban for account in self.accounts] if self.accounts else []
+        # Requires self.own_ibans to be set before calling
+        own_ibans = self.own_ibans
 
         for transaction in transactions:
             credit_debit = transaction.creditDebitIndicator
@@ -31,6 +31,13 @@ class MonetaryAmount:
     currency: str  # ISO 4217
 
 
+def balance_from_api(data: dict[str, Any]) -> Balance:
+    return MonetaryAmount(
+        amount=float(data["amount"]["value"]),
+        currency=data["amount"]["currency"],
+    )
+
+
 class DebitCreditEnum(Enum):
     Credit = "CRDT"  # Credit transaction
     Debit = "DBIT"  # Debit transaction
@@ -98,5 +105,14 @@ def transaction_from_api(transaction: dict[str, Any]) -> Transaction:
     )
 
 
+@dataclass
+class ApiSnapshot:
+    """Data fetched while validating credentials in the config flow."""
+
+    access_token: str
+    accounts: list[Account]
+    balances: dict[str, Balance]  # Keyed by account id
+
+
 def _parse_date(inp: str) -> date:
     return date.fromisoformat(inp)
@@ -0,0 +1,143 @@
+"""Opt-in profiling of ErsteGroup refreshes."""
+
+from __future__ import annotations
+
+import cProfile
+from dataclasses import dataclass
+from datetime import datetime
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+
+# Deep enough to reach integration frames from allocations in aiohttp or json
+TRACEBACK_FRAMES = 25
+
+PACKAGE_FILES = os.path.join(os.path.dirname(__file__), "*")
+
+
+@dataclass
+class RefreshStats:
+    duration: float  # Seconds
+    # Memory stats are None when another tool was already tracing memory
+    retained: int | None = None  # Bytes allocated by integration code, still alive
+    peak: int | None = None  # Bytes traced at peak during the refresh, whole process
+
+
+class RefreshProfiler:
+    """Collect cProfile and tracemalloc data over a number of refreshes.
+
+    cProfile sees everything that runs on the event loop while a refresh is in
+    progress. Allocations are attributed to the refresh when integration code
+    is on their traceback. Tracing only runs during refreshes, and memory is
+    not traced at all when another tool is already using tracemalloc.
+    """
+
+    def __init__(self, cycles: int, path: str) -> None:
+        self.cycles = cycles
+        self.path = path
+        self.refreshes: list[RefreshStats] = []
+        self.top_allocations: list[str] = []
+        self._profile = cProfile.Profile()
+        self._tracing = False
+        self._start_time = 0.0
+
+    @property
+    def done(self) -> bool:
+        return len(self.refreshes) >= self.cycles
+
+    def start(self) -> None:
+        """Start profiling a refresh.
+
+        Raises ValueError if another profiler is already active.
+        """
+        # Leave the state of another tracer, e.g. HA's profiler integration, alone
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+            self._tracing = True
+
+        self._start_time = time.perf_counter()
+
+        try:
+            self._profile.enable()
+        except ValueError:
+            self._stop_tracing()
+            raise
+
+    def stop(self) -> None:
+        """Stop profiling a refresh, allocations are collected separately."""
+        self._profile.disable()
+        stats = RefreshStats(duration=time.perf_counter() - self._start_time)
+        if self._tracing:
+            stats.peak = tracemalloc.get_traced_memory()[1]
+        self.refreshes.append(stats)
+
+    def collect_allocations(self) -> None:
+        """Attribute the allocations of the last refresh and stop tracing.
+
+        Walks every traced block, run it in the executor.
+        """
+        if not self._tracing:
+            return
+
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            self._stop_tracing()
+
+        statistics = snapshot.filter_traces(
+            [tracemalloc.Filter(True, PACKAGE_FILES, all_frames=True)]
+        ).statistics("lineno")
+
+        self.refreshes[-1].retained = sum(stat.size for stat in statistics)
+        self.top_allocations = [str(stat) for stat in statistics[:TOP_ALLOCATIONS]]
+
+    def abort(self) -> None:
+        """Stop profiling without writing a summary."""
+        self._profile.disable()
+        self._stop_tracing()
+
+    def _stop_tracing(self) -> None:
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def write_summary(self) -> None:
+        """Write the summary to `path`. Blocks on disk I/O."""
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(self.summary())
+
+    def summary(self) -> str:
+        out = io.StringIO()
+        out.write(f"ErsteGroup refresh profile, {datetime.now().isoformat()}\n\n")
+
+        out.write("Refreshes:\n")
+        for index, stats in enumerate(self.refreshes, start=1):
+            out.write(f"  #{index}: {stats.duration * 1000:.1f} ms")
+            if stats.retained is not None:
+                out.write(
+                    f", retained {stats.retained / 1024:.1f} KiB, "
+                    f"process peak {stats.peak / 1024:.1f} KiB during the refresh"
+                )
+            out.write("\n")
+
+        if self.refreshes[-1].retained is not None:
+            out.write(
+                f"\nTop {TOP_ALLOCATIONS} allocation sites of the last refresh, "
+                "still alive at its end:\n"
+            )
+            for line in self.top_allocations:
+                out.write(f"  {line}\n")
+        else:
+            out.write("\nMemory not traced, tracemalloc was in use by another tool\n")
+        out.write("\n")
+
+        out.write(f"Top {TOP_FUNCTIONS} functions by cumulative time:\n")
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+
+        return out.getvalue()
@@ -0,0 +1,286 @@
+"""Record and replay of ErsteGroup API traffic.
+
+Recordings are gzip compressed JSON lines, one API exchange per line. Every
+flush appends a new gzip member, so a recording can grow across refreshes
+without rewriting the file.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from datetime import datetime
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import re
+import sys
+from typing import Any
+from urllib.parse import urlparse
+
+from aiohttp import ClientConnectionError, ClientResponseError, ClientSession
+from aiohttp.client_reqrep import RequestInfo
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from homeassistant.core import HomeAssistant
+
+from .const import API_ACCOUNTS
+
+_LOGGER = logging.getLogger(__name__)
+
+REDACTED = "REDACTED"
+
+# Response fields that must never end up in a recording
+SENSITIVE_KEYS = (
+    "access_token",
+    "refresh_token",
+    "id_token",
+    "remittanceInformation",
+    "additionalTransactionInformation",
+)
+
+# Personal fields replaced by stable pseudonyms, so matching on them still works
+PSEUDONYMIZED_KEYS = ("id", "iban", "bban", "name", "nameI18N")
+
+# Account ids also appear in request paths
+ACCOUNT_ID_IN_PATH = re.compile(rf"({re.escape(API_ACCOUNTS)}/)([^/?]+)")
+
+# Query parameters derived from the current date, ignored when matching
+VOLATILE_PARAMS = ("fromDate", "toDate")
+
+
+def _request_key(method: str, url: str, params: dict[str, Any] | None) -> str:
+    """Build the key used to match a request against recorded exchanges."""
+    stable_params = sorted(
+        (key, str(value))
+        for key, value in (params or {}).items()
+        if key not in VOLATILE_PARAMS
+    )
+    return f"{method} {urlparse(url).path} {stable_params}"
+
+
+class _Sanitizer:
+    """Redact credentials and pseudonymize personal data of API exchanges.
+
+    Pseudonyms are keyed with a secret that is not part of the recording, so
+    they are stable across flushes but cannot be reversed by guessing IBANs.
+    """
+
+    def __init__(self, secret: str) -> None:
+        self._secret = secret.encode()
+
+    def pseudonym(self, value: str) -> str:
+        digest = hmac.new(self._secret, value.encode(), hashlib.sha256)
+        return f"anon-{digest.hexdigest()[:16]}"
+
+    def url(self, url: str) -> str:
+        return ACCOUNT_ID_IN_PATH.sub(
+            lambda match: match.group(1) + self.pseudonym(match.group(2)), url
+        )
+
+    def body(self, data: Any) -> Any:
+        if isinstance(data, dict):
+            return {key: self._field(key, value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.body(value) for value in data]
+        return data
+
+    def _field(self, key: str, value: Any) -> Any:
+        if key in SENSITIVE_KEYS:
+            return REDACTED
+        if key in PSEUDONYMIZED_KEYS and isinstance(value, str):
+            return self.pseudonym(value)
+        return self.body(value)
+
+
+class RecordingSession:
+    """Wrap an aiohttp session and capture sanitized responses.
+
+    Recording stops after `refreshes` flushes, which bounds the file size.
+    """
+
+    def __init__(
+        self, session: ClientSession, path: str, secret: str, refreshes: int
+    ) -> None:
+        self.session = session
+        self.refreshes = refreshes
+        self.flushes = 0
+        self._path = path
+        self._sanitizer = _Sanitizer(secret)
+        self._exchanges: list[dict[str, Any]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.flushes >= self.refreshes
+
+    def get(self, url: str, **kwargs: Any) -> _RecordingRequest:
+        return _RecordingRequest(self, "GET", url, kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> _RecordingRequest:
+        return _RecordingRequest(self, "POST", url, kwargs)
+
+    async def async_flush(self, hass: HomeAssistant) -> None:
+        """Append captured exchanges to the recording."""
+        if not self._exchanges:
+            return
+
+        self.flushes += 1
+        exchanges, self._exchanges = self._exchanges, []
+        try:
+            await hass.async_add_executor_job(self._write, exchanges)
+        except OSError as err:
+            _LOGGER.error("Failed to write recording to %s: %s", self._path, err)
+            return
+        _LOGGER.debug("Recorded %d API exchanges to %s", len(exchanges), self._path)
+
+    def _write(self, exchanges: list[dict[str, Any]]) -> None:
+        lines = "".join(
+            json.dumps(exchange, separators=(",", ":")) + "\n"
+            for exchange in exchanges
+        )
+        with gzip.open(self._path, "at", encoding="utf-8") as file:
+            file.write(lines)
+
+
+class _RecordingRequest:
+    """Async context manager performing a request and recording its response."""
+
+    def __init__(
+        self,
+        recorder: RecordingSession,
+        method: str,
+        url: str,
+        kwargs: dict[str, Any],
+    ) -> None:
+        self._recorder = recorder
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._request = None
+
+    async def __aenter__(self):
+        self._request = self._recorder.session.request(
+            self._method, self._url, **self._kwargs
+        )
+        response = await self._request.__aenter__()
+
+        try:
+            # Body is cached by aiohttp, so the caller can still read it
+            body = await response.read()
+        except BaseException:
+            await self._request.__aexit__(*sys.exc_info())
+            raise
+
+        sanitizer = self._recorder._sanitizer
+        try:
+            content = sanitizer.body(json.loads(body))
+        except ValueError:
+            content = body.decode(errors="replace")
+
+        self._recorder._exchanges.append(
+            {
+                "method": self._method,
+                "url": sanitizer.url(self._url),
+                "params": self._kwargs.get("params"),
+                "status": response.status,
+                "body": content,
+                "recorded_at": datetime.now().isoformat(),
+            }
+        )
+        return response
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._request.__aexit__(*exc_info)
+
+
+class ReplaySession:
+    """Serve recorded responses in place of an aiohttp session.
+
+    Responses for the same request are served in recorded order. Once only
+    one is left it is repeated, so replay never runs dry mid refresh. `now`
+    follows the recording time of the last served response, so date windows
+    come out the same as when the responses were recorded.
+    """
+
+    def __init__(self, exchanges: list[dict[str, Any]]) -> None:
+        self.now = (
+            datetime.fromisoformat(exchanges[0]["recorded_at"])
+            if exchanges
+            else datetime.now()
+        )
+        self._responses: dict[str, deque[dict[str, Any]]] = {}
+        for exchange in exchanges:
+            key = _request_key(
+                exchange["method"], exchange["url"], exchange.get("params")
+            )
+            self._responses.setdefault(key, deque()).append(exchange)
+
+    @classmethod
+    async def async_load(cls, hass: HomeAssistant, path: str) -> ReplaySession:
+        """Load a recording from disk."""
+        exchanges = await hass.async_add_executor_job(cls._read, path)
+        _LOGGER.debug("Loaded %d recorded API exchanges from %s", len(exchanges), path)
+        return cls(exchanges)
+
+    @staticmethod
+    def _read(path: str) -> list[dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def get(self, url: str, **kwargs: Any) -> ReplayResponse:
+        return self._replay("GET", url, kwargs.get("params"))
+
+    def post(self, url: str, **kwargs: Any) -> ReplayResponse:
+        return self._replay("POST", url, kwargs.get("params"))
+
+    def _replay(
+        self, method: str, url: str, params: dict[str, Any] | None
+    ) -> ReplayResponse:
+        key = _request_key(method, url, params)
+        queue = self._responses.get(key)
+
+        if not queue:
+            raise ClientConnectionError(f"No recorded response for {key}")
+
+        exchange = queue.popleft() if len(queue) > 1 else queue[0]
+        self.now = datetime.fromisoformat(exchange["recorded_at"])
+        return ReplayResponse(method, url, exchange["status"], exchange["body"])
+
+
+class ReplayResponse:
+    """Recorded response, usable like an aiohttp response context."""
+
+    def __init__(self, method: str, url: str, status: int, body: Any) -> None:
+        self.method = method
+        self.url = URL(url)
+        self.status = status
+        self._body = body
+
+    async def __aenter__(self) -> ReplayResponse:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def json(self) -> Any:
+        return self._body
+
+    async def text(self) -> str:
+        if isinstance(self._body, str):
+            return self._body
+        return json.dumps(self._body)
+
+    def raise_for_status(self) -> None:
+        if self.status < 400:
+            return
+
+        raise ClientResponseError(
+            RequestInfo(
+                self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url
+            ),
+            (),
+            status=self.status,
+            message="Recorded error response",
+        )
@@ -30,6 +30,11 @@ async def async_setup_entry(
     if not coordinator.data:
         return
 
+    # Replayed account ids are pseudonyms, entities for them would be orphaned
+    if coordinator.replaying:
+        _LOGGER.warning("Replaying a recording, sensors are not set up")
+        return
+
     entities = []
 
     for account_id, account_data in coordinator.data.get("accounts", {}).items():
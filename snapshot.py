@@ -0,0 +1,59 @@
+"""Hand-off of config flow data to the first refresh of the new entry."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from functools import partial
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN, SNAPSHOT_MAX_AGE
+from .dataclass import ApiSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+# Pending snapshots are kept in hass.data[DOMAIN], keyed by the refresh token
+# the entry is created with
+type PendingSnapshots = dict[str, tuple[ApiSnapshot, CALLBACK_TYPE]]
+
+
+@callback
+def async_add_snapshot(
+    hass: HomeAssistant, refresh_token: str, snapshot: ApiSnapshot
+) -> None:
+    """Keep a snapshot for the entry created with `refresh_token`.
+
+    The snapshot holds a live access token, it is dropped after
+    SNAPSHOT_MAX_AGE if no entry is set up with it.
+    """
+    pending: PendingSnapshots = hass.data.setdefault(DOMAIN, {})
+    if refresh_token in pending:
+        pending.pop(refresh_token)[1]()
+
+    cancel = async_call_later(
+        hass, SNAPSHOT_MAX_AGE, partial(_async_expire, hass, refresh_token)
+    )
+    pending[refresh_token] = (snapshot, cancel)
+
+
+@callback
+def async_pop_snapshot(hass: HomeAssistant, refresh_token: str) -> ApiSnapshot | None:
+    """Take the snapshot left for the entry created with `refresh_token`."""
+    pending: PendingSnapshots = hass.data.get(DOMAIN, {})
+    if (item := pending.pop(refresh_token, None)) is None:
+        return None
+
+    if not pending:
+        del hass.data[DOMAIN]
+
+    snapshot, cancel = item
+    cancel()
+    return snapshot
+
+
+@callback
+def _async_expire(hass: HomeAssistant, refresh_token: str, _now: datetime) -> None:
+    if async_pop_snapshot(hass, refresh_token) is not None:
+        _LOGGER.debug("Dropped config flow snapshot of an entry that was not set up")
@@ -0,0 +1,186 @@
+"""SQLite backed transaction history for ErsteGroup."""
+
+from __future__ import annotations
+
+from datetime import date
+import json
+import sqlite3
+import threading
+from typing import Any
+
+from .dataclass import DebitCreditEnum, Transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    entry_reference TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    credit_debit TEXT NOT NULL,
+    status TEXT NOT NULL,
+    booking_date TEXT NOT NULL,
+    value_date TEXT NOT NULL,
+    creditor_iban TEXT,
+    creditor_name TEXT,
+    debitor_iban TEXT,
+    debitor_name TEXT,
+    internal INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_id, entry_reference)
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_booking_date
+    ON transactions (account_id, booking_date);
+DROP INDEX IF EXISTS idx_transactions_value_date;
+DROP INDEX IF EXISTS idx_transactions_creditor_iban;
+DROP INDEX IF EXISTS idx_transactions_debitor_iban;
+"""
+
+# Databases created before transfers between own accounts were flagged
+ADD_INTERNAL = "ALTER TABLE transactions ADD COLUMN internal INTEGER NOT NULL DEFAULT 0"
+
+PRUNE = """
+DELETE FROM transactions
+WHERE account_id = ? AND booking_date >= ?
+    AND entry_reference NOT IN (SELECT value FROM json_each(?))
+"""
+
+UPSERT = """
+INSERT INTO transactions (
+    account_id, entry_reference, amount, currency, credit_debit, status,
+    booking_date, value_date, creditor_iban, creditor_name, debitor_iban,
+    debitor_name, internal
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account_id, entry_reference) DO UPDATE SET
+    amount = excluded.amount,
+    currency = excluded.currency,
+    credit_debit = excluded.credit_debit,
+    status = excluded.status,
+    booking_date = excluded.booking_date,
+    value_date = excluded.value_date,
+    creditor_iban = excluded.creditor_iban,
+    creditor_name = excluded.creditor_name,
+    debitor_iban = excluded.debitor_iban,
+    debitor_name = excluded.debitor_name,
+    internal = excluded.internal
+"""
+
+# The window is what a refetch returns, the API filters it by booking date.
+# MTD is the part of it with a value date in the current month.
+SPENDING_INCOME = """
+SELECT
+    COALESCE(SUM(CASE WHEN credit_debit = :debit THEN amount END), 0.0),
+    COALESCE(SUM(CASE WHEN credit_debit = :credit THEN amount END), 0.0),
+    COALESCE(SUM(
+        CASE WHEN credit_debit = :debit AND value_date >= :month_start
+        THEN amount END
+    ), 0.0),
+    COALESCE(SUM(
+        CASE WHEN credit_debit = :credit AND value_date >= :month_start
+        THEN amount END
+    ), 0.0)
+FROM transactions
+WHERE account_id = :account_id AND booking_date >= :from_date AND NOT internal
+"""
+
+
+class TransactionStore:
+    """Local history of parsed transactions.
+
+    All methods block on disk I/O and must be run in the executor.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def open(self) -> None:
+        # Executor jobs may run on any worker thread, access is serialized by the lock
+        self._connection = sqlite3.connect(self._path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+            columns = {
+                row[1]
+                for row in self._connection.execute("PRAGMA table_info(transactions)")
+            }
+            if "internal" not in columns:
+                # Rows of the window are rewritten by the next refresh
+                self._connection.execute(ADD_INTERNAL)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def sync_window(
+        self,
+        account_id: str,
+        transactions: list[Transaction],
+        from_date: date,
+        month_start: date,
+        own_ibans: set[str],
+    ) -> tuple[float, float, float, float]:
+        """Store a refetched window and sum its spending and income.
+
+        `transactions` is everything the API returned since `from_date`, rows
+        booked in that window that it no longer contains are deleted. Returns
+        30 day spending and income followed by the MTD ones, both excluding
+        transfers between own accounts.
+        """
+        rows = [
+            _row(account_id, transaction, own_ibans) for transaction in transactions
+        ]
+        references = [transaction.entryReference for transaction in transactions]
+
+        with self._lock:
+            if self._connection is None:
+                # A job queued by a cancelled refresh may run after close
+                raise sqlite3.ProgrammingError("Transaction store is closed")
+
+            with self._connection:
+                self._connection.executemany(UPSERT, rows)
+                self._connection.execute(
+                    PRUNE, (account_id, from_date.isoformat(), json.dumps(references))
+                )
+                spending_30d, income_30d, spending_mtd, income_mtd = (
+                    self._connection.execute(
+                        SPENDING_INCOME,
+                        {
+                            "debit": DebitCreditEnum.Debit.value,
+                            "credit": DebitCreditEnum.Credit.value,
+                            "account_id": account_id,
+                            "from_date": from_date.isoformat(),
+                            "month_start": month_start.isoformat(),
+                        },
+                    ).fetchone()
+                )
+
+        return spending_30d, income_30d, spending_mtd, income_mtd
+
+
+def _row(
+    account_id: str, transaction: Transaction, own_ibans: set[str]
+) -> tuple[Any, ...]:
+    creditor, debitor = transaction.creditor, transaction.debitor
+
+    # Same rule as the in-memory calculation in the coordinator
+    if transaction.creditDebitIndicator == DebitCreditEnum.Debit:
+        internal = creditor is not None and creditor.iban in own_ibans
+    else:
+        internal = debitor is not None and debitor.iban in own_ibans
+
+    return (
+        account_id,
+        transaction.entryReference,
+        transaction.amount.amount,
+        transaction.amount.currency,
+        transaction.creditDebitIndicator.value,
+        transaction.status.value,
+        transaction.bookingDate.isoformat(),
+        transaction.valueDate.isoformat(),
+        creditor.iban if creditor else None,
+        creditor.name if creditor else None,
+        debitor.iban if debitor else None,
+        debitor.name if debitor else None,
+        internal,
+    )
@@ -0,0 +1,142 @@
+"""Fixtures for ErsteGroup tests.
+
+The tests need Home Assistant and pytest-homeassistant-custom-component, test
+modules skip themselves when those are not installed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import importlib.util
+from pathlib import Path
+import sys
+from typing import Any
+
+import pytest
+
+try:
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+except ImportError:
+    pass
+else:
+    # The repository root is the integration package
+    _ROOT = Path(__file__).parent.parent
+    _spec = importlib.util.spec_from_file_location(
+        "erstegroup", _ROOT / "__init__.py", submodule_search_locations=[str(_ROOT)]
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["erstegroup"] = _module
+    _spec.loader.exec_module(_module)
+
+API_BASE_URL = "https://api.example.com/v3/accounts"
+IDP_BASE_URL = "https://idp.example.com/v1/idp"
+
+OWNER_NAME = "Jana Nováková"
+
+
+def account_payload(index: int) -> dict[str, Any]:
+    return {
+        "id": f"ACC{index:04d}",
+        "currency": "CZK",
+        "nameI18N": OWNER_NAME,
+        "productI18N": "Osobní účet",
+        "identification": {"iban": f"CZ650800000000{index:010d}"},
+    }
+
+
+def balance_payload(amount: float) -> dict[str, Any]:
+    return {"balances": [{"amount": {"value": amount, "currency": "CZK"}}]}
+
+
+def transaction_payload(
+    reference: str,
+    amount: float,
+    credit_debit: str,
+    value_date: str,
+    counterparty_iban: str | None = None,
+) -> dict[str, Any]:
+    related_parties: dict[str, Any] = {}
+    if counterparty_iban is not None:
+        side = "creditor" if credit_debit == "DBIT" else "debtor"
+        related_parties[side] = {"name": "Counterparty s.r.o."}
+        related_parties[f"{side}Account"] = {
+            "identification": {"iban": counterparty_iban}
+        }
+
+    return {
+        "entryReference": reference,
+        "amount": {"value": amount, "currency": "CZK"},
+        "creditDebitIndicator": credit_debit,
+        "status": "BOOK",
+        "bookingDate": {"date": value_date},
+        "valueDate": {"date": value_date},
+        "entryDetails": {"transactionDetails": {"relatedParties": related_parties}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def config_dir(hass, tmp_path: Path) -> Path:
+    hass.config.config_dir = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def entry_options() -> dict[str, Any]:
+    return {}
+
+
+@pytest.fixture
+def config_entry(hass, entry_options: dict[str, Any]) -> MockConfigEntry:
+    from erstegroup.const import (
+        CONF_API_BASE_URL,
+        CONF_API_KEY,
+        CONF_CLIENT_ID,
+        CONF_CLIENT_SECRET,
+        CONF_IDP_BASE_URL,
+        CONF_PAYDAY,
+        CONF_REFRESH_TOKEN,
+        DOMAIN,
+    )
+
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_API_KEY: "api-key",
+            CONF_CLIENT_ID: "client-id",
+            CONF_CLIENT_SECRET: "client-secret",
+            CONF_REFRESH_TOKEN: "refresh-0",
+            CONF_API_BASE_URL: API_BASE_URL,
+            CONF_IDP_BASE_URL: IDP_BASE_URL,
+            CONF_PAYDAY: 15,
+        },
+        options=entry_options,
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+@pytest.fixture
+def mock_api(aioclient_mock) -> Callable[..., None]:
+    """Register static API responses, the token endpoint always succeeds."""
+
+    def register(
+        accounts: list[dict[str, Any]],
+        transactions: dict[str, list[dict[str, Any]]],
+        balance: float = 1000.0,
+    ) -> None:
+        aioclient_mock.post(
+            f"{IDP_BASE_URL}/token",
+            json={"access_token": "access", "refresh_token": "refresh-1"},
+        )
+        aioclient_mock.get(
+            f"{API_BASE_URL}/my/accounts", json={"accounts": accounts}
+        )
+        for account in accounts:
+            account_url = f"{API_BASE_URL}/my/accounts/{account['id']}"
+            aioclient_mock.get(f"{account_url}/balance", json=balance_payload(balance))
+            aioclient_mock.get(
+                f"{account_url}/transactions",
+                json={"transactions": transactions.get(account["id"], [])},
+            )
+
+    return register
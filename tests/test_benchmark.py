@@ -0,0 +1,169 @@
+"""Timing thresholds for the refresh hot paths.
+
+Thresholds are generous multiples of the times measured on a laptop, they
+catch complexity regressions rather than small slowdowns. Each case reports
+the best of a few repeats, which is the least noisy estimate on shared CI.
+
+The benchmarks take a while and depend on the machine, they only run when
+selected with `pytest -m benchmark`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import gzip
+import json
+import time
+from typing import Any
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+pytestmark = pytest.mark.benchmark
+
+from conftest import (
+    API_BASE_URL,
+    IDP_BASE_URL,
+    account_payload,
+    balance_payload,
+    transaction_payload,
+)
+
+from erstegroup.const import CONF_HISTORY_DB, CONF_REPLAY_FILE
+from erstegroup.coordinator import ErsteGroupCoordinator
+from erstegroup.dataclass import account_from_api, transaction_from_api
+
+REPEATS = 5
+RECORDED_AT = "2025-03-20T12:00:00"
+TRANSACTIONS_PER_ACCOUNT = 20
+
+
+def _best_of(function: Callable[[], Any], repeats: int = REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def _async_best_of(function: Callable[[], Any], repeats: int = REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _transactions(count: int, own_iban: str) -> list[dict[str, Any]]:
+    """Mix of spending, income and internal transfers."""
+    return [
+        transaction_payload(
+            f"TX{index:06d}",
+            100.0 + index,
+            "DBIT" if index % 2 else "CRDT",
+            f"2025-03-{index % 20 + 1:02d}",
+            own_iban if index % 5 == 0 else f"CZ1000000000{index:012d}",
+        )
+        for index in range(count)
+    ]
+
+
+def _exchange(method: str, url: str, body: Any, params=None) -> dict[str, Any]:
+    return {
+        "method": method,
+        "url": url,
+        "params": params,
+        "status": 200,
+        "body": body,
+        "recorded_at": RECORDED_AT,
+    }
+
+
+def _write_recording(path, accounts: list[dict[str, Any]]) -> None:
+    exchanges = [
+        _exchange(
+            "POST",
+            f"{IDP_BASE_URL}/token",
+            {"access_token": "access", "refresh_token": "refresh-1"},
+        ),
+        _exchange("GET", f"{API_BASE_URL}/my/accounts", {"accounts": accounts}),
+    ]
+    for index, account in enumerate(accounts):
+        account_url = f"{API_BASE_URL}/my/accounts/{account['id']}"
+        other_iban = accounts[index - 1]["identification"]["iban"]
+        exchanges.append(
+            _exchange("GET", f"{account_url}/balance", balance_payload(1000.0))
+        )
+        exchanges.append(
+            _exchange(
+                "GET",
+                f"{account_url}/transactions",
+                {"transactions": _transactions(TRANSACTIONS_PER_ACCOUNT, other_iban)},
+                params={"size": 100, "page": 0},
+            )
+        )
+
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        for exchange in exchanges:
+            file.write(json.dumps(exchange) + "\n")
+
+
+def test_transaction_from_api():
+    payloads = _transactions(1000, account_payload(1)["identification"]["iban"])
+
+    best = _best_of(lambda: [transaction_from_api(payload) for payload in payloads])
+
+    # ~5 µs per transaction
+    assert best / len(payloads) < 50e-6
+
+
+async def test_calculate_spending_income(hass, config_entry):
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    coordinator.accounts = [
+        account_from_api(account_payload(index)) for index in range(1000)
+    ]
+    coordinator.own_ibans = {account.iban for account in coordinator.accounts}
+    own_iban = coordinator.accounts[-1].iban
+    transactions = [
+        transaction_from_api(payload) for payload in _transactions(10_000, own_iban)
+    ]
+
+    best = _best_of(lambda: coordinator._calculate_spending_income(transactions))
+
+    # ~2 ms with a set of own IBANs, ~190 ms with a list
+    assert best < 0.02
+
+
+# Per account budgets, a refresh must scale linearly with the account count
+@pytest.mark.parametrize("account_count", [10, 100, 1000])
+@pytest.mark.parametrize(
+    ("history_db", "per_account"),
+    # ~0.2 ms in memory, ~1 ms with the history database
+    [(False, 0.001), (True, 0.005)],
+    ids=["memory", "history_db"],
+)
+async def test_update_data(
+    hass, config_entry, config_dir, account_count, history_db, per_account
+):
+    _write_recording(
+        config_dir / "benchmark.jsonl.gz",
+        [account_payload(index) for index in range(account_count)],
+    )
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={CONF_REPLAY_FILE: "benchmark.jsonl.gz", CONF_HISTORY_DB: history_db},
+    )
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+
+    try:
+        data = await coordinator._async_update_data()
+        best = await _async_best_of(coordinator._async_update_data, repeats=3)
+    finally:
+        await coordinator.async_shutdown()
+
+    assert len(data["accounts"]) == account_count
+    assert best / account_count < per_account
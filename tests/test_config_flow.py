@@ -0,0 +1,190 @@
+"""Tests for the credential probe of the ErsteGroup config flow."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from conftest import API_BASE_URL, IDP_BASE_URL, account_payload, balance_payload
+from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMockResponse,
+)
+
+from erstegroup.config_flow import ErsteGroupConfigFlow
+from erstegroup.const import (
+    CONF_REFRESH_TOKEN,
+    DOMAIN,
+    PROBE_CONCURRENCY,
+    SNAPSHOT_MAX_AGE,
+)
+from erstegroup.coordinator import ErsteGroupCoordinator
+from erstegroup.snapshot import async_pop_snapshot
+
+ACCOUNTS = [account_payload(1), account_payload(2)]
+
+
+def _flow(hass) -> ErsteGroupConfigFlow:
+    flow = ErsteGroupConfigFlow()
+    flow.hass = hass
+    flow.handler = DOMAIN
+    flow.flow_id = "flow"
+    flow.context = {"source": "user"}
+    flow._api_key = "api-key"
+    flow._client_id = "client-id"
+    flow._client_secret = "client-secret"
+    flow._api_base_url = API_BASE_URL
+    flow._idp_base_url = IDP_BASE_URL
+    return flow
+
+
+def _mock_token(aioclient_mock, **token_data) -> None:
+    aioclient_mock.post(f"{IDP_BASE_URL}/token", json=token_data)
+
+
+def _mock_accounts(aioclient_mock, balance_status: int = 200) -> None:
+    aioclient_mock.get(f"{API_BASE_URL}/my/accounts", json={"accounts": ACCOUNTS})
+    for account in ACCOUNTS:
+        aioclient_mock.get(
+            f"{API_BASE_URL}/my/accounts/{account['id']}/balance",
+            status=balance_status,
+            json=balance_payload(1234.5),
+        )
+
+
+async def test_missing_access_token_aborts(hass, aioclient_mock):
+    _mock_token(aioclient_mock, refresh_token="refresh-new")
+
+    result = await _flow(hass)._exchange_token("code")
+
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "no_access_token"
+    # Nothing was probed with a bogus token
+    assert aioclient_mock.call_count == 1
+
+
+@pytest.mark.parametrize(
+    ("accounts_status", "balance_status", "reason"),
+    [(401, 200, "probe_accounts_failed"), (200, 500, "probe_balances_failed")],
+)
+async def test_failed_probe_step_is_reported(
+    hass, aioclient_mock, accounts_status, balance_status, reason
+):
+    _mock_token(aioclient_mock, access_token="access", refresh_token="refresh-new")
+    if accounts_status != 200:
+        aioclient_mock.get(f"{API_BASE_URL}/my/accounts", status=accounts_status)
+    _mock_accounts(aioclient_mock, balance_status)
+
+    result = await _flow(hass)._exchange_token("code")
+
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == reason
+
+
+async def test_snapshot_warms_first_refresh(hass, aioclient_mock):
+    _mock_token(aioclient_mock, access_token="access", refresh_token="refresh-new")
+    _mock_accounts(aioclient_mock)
+    for account in ACCOUNTS:
+        aioclient_mock.get(
+            f"{API_BASE_URL}/my/accounts/{account['id']}/transactions",
+            json={"transactions": []},
+        )
+
+    result = await _flow(hass)._exchange_token("code")
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_REFRESH_TOKEN] == "refresh-new"
+
+    entry = MockConfigEntry(domain=DOMAIN, data=result["data"])
+    entry.add_to_hass(hass)
+    probe_calls = aioclient_mock.call_count
+
+    data = await ErsteGroupCoordinator(hass, entry)._async_update_data()
+
+    assert data["accounts"]["ACC0001"]["balance"] == 1234.5
+    # Only transactions were fetched, token, accounts and balances came from the flow
+    assert aioclient_mock.call_count - probe_calls == len(ACCOUNTS)
+
+    # The snapshot is used once
+    assert DOMAIN not in hass.data
+    second = ErsteGroupCoordinator(hass, entry)
+    assert second._snapshot is None
+
+
+async def test_unused_snapshot_expires(hass, aioclient_mock, freezer):
+    _mock_token(aioclient_mock, access_token="access", refresh_token="refresh-new")
+    _mock_accounts(aioclient_mock)
+
+    result = await _flow(hass)._exchange_token("code")
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert DOMAIN in hass.data
+
+    # The entry was never set up, the access token must not linger
+    freezer.tick(timedelta(seconds=SNAPSHOT_MAX_AGE + 1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert DOMAIN not in hass.data
+
+
+@pytest.mark.parametrize("failing", [None, "ACC0003"])
+async def test_balance_probe_is_bounded(hass, aioclient_mock, failing):
+    accounts = [account_payload(index) for index in range(1, 21)]
+    in_flight = 0
+    peak = 0
+    requested = []
+
+    async def balance(method, url, data):
+        nonlocal in_flight, peak
+        requested.append(url)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight -= 1
+        status = 500 if failing and failing in str(url) else 200
+        return AiohttpClientMockResponse(
+            method, url, status=status, json=balance_payload(1.0)
+        )
+
+    _mock_token(aioclient_mock, access_token="access", refresh_token="refresh-new")
+    aioclient_mock.get(f"{API_BASE_URL}/my/accounts", json={"accounts": accounts})
+    for account in accounts:
+        aioclient_mock.get(
+            f"{API_BASE_URL}/my/accounts/{account['id']}/balance",
+            side_effect=balance,
+        )
+
+    result = await _flow(hass)._exchange_token("code")
+
+    assert peak == PROBE_CONCURRENCY
+    if failing:
+        assert result["reason"] == "probe_balances_failed"
+        # The remaining requests were cancelled, not left running
+        assert len(requested) < len(accounts)
+        assert in_flight == 0
+    else:
+        assert result["type"] is FlowResultType.CREATE_ENTRY
+        assert len(requested) == len(accounts)
+        assert async_pop_snapshot(hass, result["data"][CONF_REFRESH_TOKEN])
+
+
+async def test_timeout_covers_token_exchange(hass, aioclient_mock, monkeypatch):
+    async def token(method, url, data):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr("erstegroup.config_flow.PROBE_TIMEOUT", 0.01)
+    aioclient_mock.post(f"{IDP_BASE_URL}/token", side_effect=token)
+
+    result = await _flow(hass)._exchange_token("code")
+
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "probe_timeout"
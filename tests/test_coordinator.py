@@ -0,0 +1,119 @@
+"""Concurrency tests for the ErsteGroup coordinator."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from conftest import API_BASE_URL, IDP_BASE_URL, account_payload
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMockResponse,
+)
+
+from erstegroup.const import CONF_REFRESH_TOKEN
+from erstegroup.coordinator import ErsteGroupCoordinator
+
+CALLERS = 20
+
+
+class RotatingIdp:
+    """Fake IdP issuing a new refresh token per grant and rejecting reused ones."""
+
+    def __init__(self, refresh_token: str, delay: float = 0.01) -> None:
+        self.valid = refresh_token
+        self.delay = delay
+        self.grants = 0
+        self.rejected = 0
+
+    async def token(self, method, url, data):
+        # Keep the grant in flight long enough for callers to overlap
+        await asyncio.sleep(self.delay)
+
+        if data["refresh_token"] != self.valid:
+            self.rejected += 1
+            return AiohttpClientMockResponse(method, url, status=401)
+
+        self.grants += 1
+        self.valid = f"refresh-{self.grants}"
+        return AiohttpClientMockResponse(
+            method,
+            url,
+            json={"access_token": f"access-{self.grants}", "refresh_token": self.valid},
+        )
+
+
+@pytest.fixture
+def idp(aioclient_mock, config_entry) -> RotatingIdp:
+    idp = RotatingIdp(config_entry.data[CONF_REFRESH_TOKEN])
+    aioclient_mock.post(f"{IDP_BASE_URL}/token", side_effect=idp.token)
+    return idp
+
+
+async def test_concurrent_token_refresh_makes_one_grant(hass, config_entry, idp):
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+
+    for round_ in range(1, 4):
+        tokens = await asyncio.gather(
+            *(coordinator._get_access_token() for _ in range(CALLERS))
+        )
+
+        assert tokens == [f"access-{round_}"] * CALLERS
+        assert idp.grants == round_
+
+    assert idp.rejected == 0
+    # The rotated token survives a restart
+    assert config_entry.data[CONF_REFRESH_TOKEN] == "refresh-3"
+
+
+async def test_sequential_updates_are_not_coalesced(
+    hass, config_entry, idp, mock_api
+):
+    mock_api([account_payload(1)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+
+    await coordinator._async_update_data()
+    await coordinator._async_update_data()
+
+    assert idp.grants == 2
+    assert not coordinator._in_flight
+
+
+async def test_overlapping_updates_are_coalesced(
+    hass, config_entry, idp, mock_api, aioclient_mock
+):
+    mock_api([account_payload(1), account_payload(2)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+
+    results = await asyncio.gather(
+        *(coordinator._async_update_data() for _ in range(CALLERS)),
+        *(coordinator._get_access_token() for _ in range(CALLERS)),
+    )
+
+    assert all(result == results[0] for result in results[:CALLERS])
+    assert idp.grants == 1
+    assert idp.rejected == 0
+    account_listings = [
+        call
+        for call in aioclient_mock.mock_calls
+        if str(call[1]) == f"{API_BASE_URL}/my/accounts"
+    ]
+    assert len(account_listings) == 1
+
+
+async def test_shutdown_cancels_in_flight_update(hass, config_entry, aioclient_mock):
+    idp = RotatingIdp(config_entry.data[CONF_REFRESH_TOKEN], delay=10)
+    aioclient_mock.post(f"{IDP_BASE_URL}/token", side_effect=idp.token)
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+
+    update = hass.async_create_task(coordinator._async_update_data())
+    await asyncio.sleep(0)
+    assert coordinator._in_flight
+
+    await coordinator.async_shutdown()
+
+    assert not coordinator._in_flight
+    with pytest.raises(asyncio.CancelledError):
+        await update
@@ -0,0 +1,92 @@
+"""Tests for opt-in refresh profiling."""
+
+from __future__ import annotations
+
+import cProfile
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from conftest import account_payload
+
+from erstegroup.const import CONF_PROFILE_REFRESHES
+from erstegroup.coordinator import ErsteGroupCoordinator
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_PROFILE_REFRESHES: 2}])
+async def test_profile_summary_written_once(
+    hass, config_entry, config_dir, mock_api
+):
+    mock_api([account_payload(1)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+
+    await coordinator._async_update_data()
+    assert not tracemalloc.is_tracing()
+    await coordinator._async_update_data()
+
+    summary = (config_dir / f"erstegroup_profile_{config_entry.entry_id}.txt").read_text()
+    assert "#2:" in summary
+    assert "_fetch_data" in summary
+    assert coordinator._profiler is None
+    assert CONF_PROFILE_REFRESHES not in config_entry.options
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_PROFILE_REFRESHES: 2}])
+async def test_profiling_yields_to_active_profiler(hass, config_entry, mock_api):
+    mock_api([account_payload(1)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+
+    other = cProfile.Profile()
+    other.enable()
+    try:
+        data = await coordinator._async_update_data()
+    finally:
+        other.disable()
+
+    assert "ACC0001" in data["accounts"]
+    assert coordinator._profiler is None
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_PROFILE_REFRESHES: 5}])
+async def test_shutdown_stops_profiling(hass, config_entry, mock_api):
+    mock_api([account_payload(1)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+    await coordinator._async_update_data()
+
+    await coordinator.async_shutdown()
+
+    assert coordinator._profiler is None
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_PROFILE_REFRESHES: 1}])
+async def test_profiling_leaves_other_tracer_alone(
+    hass, config_entry, config_dir, mock_api
+):
+    mock_api([account_payload(1)], {})
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+
+    tracemalloc.start()
+    try:
+        # A peak the other tool still wants to see
+        block = bytearray(4 * 1024 * 1024)
+        del block
+        peak = tracemalloc.get_traced_memory()[1]
+
+        await coordinator._async_update_data()
+
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[1] >= peak
+    finally:
+        tracemalloc.stop()
+
+    summary = (config_dir / f"erstegroup_profile_{config_entry.entry_id}.txt").read_text()
+    assert "Memory not traced" in summary
+    assert "_fetch_data" in summary
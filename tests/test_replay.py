@@ -0,0 +1,116 @@
+"""Tests for recording and replaying API traffic."""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from conftest import IDP_BASE_URL, OWNER_NAME, account_payload, transaction_payload
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from erstegroup.const import CONF_RECORD_FILE, CONF_RECORD_REFRESHES, CONF_REPLAY_FILE
+from erstegroup.coordinator import ErsteGroupCoordinator
+from erstegroup.sensor import async_setup_entry as async_setup_sensors
+
+RECORDING = "recording.jsonl.gz"
+
+VALUE_FIELDS = (
+    "product",
+    "currency",
+    "balance",
+    "spending_mtd",
+    "income_mtd",
+    "spending_30d",
+    "income_30d",
+)
+
+TRANSACTIONS = [
+    transaction_payload("T1", 100.0, "DBIT", "2026-10-02", "CZ9901000000000000000099"),
+    transaction_payload("T2", 40.0, "DBIT", "2026-09-25"),
+    transaction_payload("T3", 500.0, "CRDT", "2026-10-05"),
+    # Transfer from the second own account, not income
+    transaction_payload(
+        "T4", 70.0, "CRDT", "2026-10-06", account_payload(2)["identification"]["iban"]
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "entry_options", [{CONF_RECORD_FILE: RECORDING, CONF_RECORD_REFRESHES: 1}]
+)
+async def test_record_and_replay(hass, config_entry, config_dir, mock_api, freezer):
+    freezer.move_to("2026-10-19 12:00:00")
+    accounts = [account_payload(1), account_payload(2)]
+    mock_api(accounts, {accounts[0]["id"]: TRANSACTIONS})
+
+    recorder = ErsteGroupCoordinator(hass, config_entry)
+    await recorder._async_setup()
+    recorded = await recorder._async_update_data()
+
+    # Recording stops after the configured number of refreshes
+    assert recorder._recorder is None
+    assert CONF_RECORD_FILE not in config_entry.options
+
+    with gzip.open(config_dir / RECORDING, "rt", encoding="utf-8") as file:
+        content = file.read()
+    for personal in ("refresh-1", OWNER_NAME, "ACC0001", "CZ9901000000000000000099"):
+        assert personal not in content
+
+    # A month later, the windows still come out as recorded
+    freezer.move_to("2026-11-20 08:00:00")
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_REPLAY_FILE: RECORDING}
+    )
+    replayer = ErsteGroupCoordinator(hass, config_entry)
+    await replayer._async_setup()
+    replayed = await replayer._async_update_data()
+
+    assert recorded["accounts"]["ACC0001"]["spending_mtd"] == 100.0
+    assert recorded["accounts"]["ACC0001"]["income_mtd"] == 500.0
+    assert recorded["accounts"]["ACC0001"]["spending_30d"] == 140.0
+    assert _values(replayed) == _values(recorded)
+
+
+def _values(data: dict) -> list[dict]:
+    """Account values without the fields replaced by pseudonyms."""
+    return [
+        {key: account[key] for key in VALUE_FIELDS}
+        for account in data["accounts"].values()
+    ]
+
+
+async def test_replay_leaves_live_entry_alone(hass, config_entry, config_dir):
+    with gzip.open(config_dir / RECORDING, "wt", encoding="utf-8") as file:
+        file.write(
+            json.dumps(
+                {
+                    "method": "POST",
+                    "url": f"{IDP_BASE_URL}/token",
+                    "params": None,
+                    "status": 401,
+                    "body": "",
+                    "recorded_at": "2026-10-19T12:00:00",
+                }
+            )
+            + "\n"
+        )
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_REPLAY_FILE: RECORDING}
+    )
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+
+    # A recorded rejection must not start a reauth of the real entry
+    with pytest.raises(UpdateFailed):
+        await coordinator._async_update_data()
+
+    # Sensors for pseudonymized accounts would stay in the entity registry
+    coordinator.data = {"accounts": {"anon-0123456789abcdef": {}}}
+    config_entry.runtime_data = coordinator
+    entities = []
+    await async_setup_sensors(hass, config_entry, entities.extend)
+    assert entities == []
@@ -0,0 +1,127 @@
+"""Tests for the SQLite transaction history."""
+
+from __future__ import annotations
+
+from contextlib import closing
+from datetime import date
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from conftest import account_payload, transaction_payload
+
+from erstegroup.const import CONF_HISTORY_DB
+from erstegroup.coordinator import ErsteGroupCoordinator
+from erstegroup.dataclass import transaction_from_api
+from erstegroup.storage import TransactionStore
+
+ACCOUNTS = [account_payload(1), account_payload(2)]
+
+TRANSACTIONS = [
+    transaction_payload("T1", 100.0, "DBIT", "2026-10-02", "CZ9901000000000000000099"),
+    transaction_payload("T2", 40.0, "DBIT", "2026-09-25"),
+    transaction_payload("T3", 500.0, "CRDT", "2026-10-05"),
+    transaction_payload(
+        "T4", 70.0, "CRDT", "2026-10-06", ACCOUNTS[1]["identification"]["iban"]
+    ),
+]
+
+WINDOWS = ("spending_mtd", "income_mtd", "spending_30d", "income_30d")
+
+
+async def _refresh(hass, config_entry, mock_api, aioclient_mock, transactions):
+    aioclient_mock.clear_requests()
+    mock_api(ACCOUNTS, {ACCOUNTS[0]["id"]: transactions})
+
+    coordinator = ErsteGroupCoordinator(hass, config_entry)
+    await coordinator._async_setup()
+    try:
+        data = await coordinator._async_update_data()
+    finally:
+        await coordinator.async_shutdown()
+    return {key: data["accounts"]["ACC0001"][key] for key in WINDOWS}
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_HISTORY_DB: True}])
+async def test_store_matches_list_path(
+    hass, config_entry, config_dir, mock_api, aioclient_mock, freezer
+):
+    freezer.move_to("2026-10-19 12:00:00")
+
+    stored = await _refresh(hass, config_entry, mock_api, aioclient_mock, TRANSACTIONS)
+    assert stored == {
+        "spending_mtd": 100.0,
+        "income_mtd": 500.0,
+        "spending_30d": 140.0,
+        "income_30d": 500.0,
+    }
+    assert (config_dir / f"erstegroup_{config_entry.entry_id}.db").exists()
+
+    # The bank no longer returns T3, e.g. it was reversed
+    remaining = [t for t in TRANSACTIONS if t["entryReference"] != "T3"]
+    stored = await _refresh(hass, config_entry, mock_api, aioclient_mock, remaining)
+
+    hass.config_entries.async_update_entry(config_entry, options={})
+    listed = await _refresh(hass, config_entry, mock_api, aioclient_mock, remaining)
+
+    assert stored == listed
+    assert stored["income_mtd"] == 0.0
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_HISTORY_DB: True}])
+async def test_windows_follow_booking_date(
+    hass, config_entry, mock_api, aioclient_mock, freezer
+):
+    freezer.move_to("2026-10-19 12:00:00")
+    # Booked within the refetch window, value date before it
+    backdated = transaction_payload("T5", 100.0, "DBIT", "2026-09-10")
+    backdated["bookingDate"] = {"date": "2026-10-01"}
+
+    stored = await _refresh(hass, config_entry, mock_api, aioclient_mock, [backdated])
+    hass.config_entries.async_update_entry(config_entry, options={})
+    listed = await _refresh(hass, config_entry, mock_api, aioclient_mock, [backdated])
+
+    assert stored == listed
+    assert stored["spending_30d"] == 100.0
+    assert stored["spending_mtd"] == 0.0
+
+
+def test_database_without_internal_column_is_upgraded(tmp_path):
+    path = str(tmp_path / "history.db")
+    with closing(sqlite3.connect(path)) as connection, connection:
+        connection.execute(
+            "CREATE TABLE transactions (account_id TEXT NOT NULL, "
+            "entry_reference TEXT NOT NULL, amount REAL NOT NULL, "
+            "currency TEXT NOT NULL, credit_debit TEXT NOT NULL, "
+            "status TEXT NOT NULL, booking_date TEXT NOT NULL, "
+            "value_date TEXT NOT NULL, creditor_iban TEXT, creditor_name TEXT, "
+            "debitor_iban TEXT, debitor_name TEXT, "
+            "PRIMARY KEY (account_id, entry_reference))"
+        )
+
+    store = TransactionStore(path)
+    store.open()
+    try:
+        sums = store.sync_window(
+            "ACC0001",
+            [transaction_from_api(payload) for payload in TRANSACTIONS],
+            date(2026, 9, 19),
+            date(2026, 10, 1),
+            {ACCOUNTS[1]["identification"]["iban"]},
+        )
+    finally:
+        store.close()
+
+    assert sums == (140.0, 500.0, 100.0, 500.0)
+
+
+def test_closed_store_rejects_late_jobs(tmp_path):
+    store = TransactionStore(str(tmp_path / "history.db"))
+    store.open()
+    store.close()
+
+    # E.g. queued by a refresh that was cancelled on unload
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.sync_window("ACC0001", [], date(2026, 9, 19), date(2026, 10, 1), set())